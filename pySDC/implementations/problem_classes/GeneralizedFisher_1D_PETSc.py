@@ -1,35 +1,247 @@
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from types import SimpleNamespace
+
 import numpy as np
+from numba import jit
 from petsc4py import PETSc
+from scipy.linalg import solve_banded
 
+from pySDC.core.Errors import ProblemError
 from pySDC.core.Problem import ptype
 from pySDC.implementations.datatype_classes.petsc_vec import petsc_vec, petsc_vec_imex, petsc_vec_comp2
 
 
-class Fisher_full(object):
+@lru_cache(maxsize=4)
+def get_fisher_kernels(nu, lam0sq):
     """
-    Helper class to generate residual and Jacobian matrix for PETSc's nonlinear solver SNES
+    Generate the compiled kernels of the Fisher problems for fixed problem parameters
+
+    The parameters enter the kernels as compile-time constants, so that e.g. u**nu reduces to a few multiplications for
+    small integer nu. Problem instances with the same parameters share the kernels.
+
+    The price is that closures cannot be cached on disk: every process compiles the kernels for each new pair of
+    parameters on their first call, which takes in the order of a second per kernel. Only the kernels of the four most
+    recently used pairs are kept, so parameter sweeps do not accumulate compiled code.
+
+    Args:
+        nu (int or float): problem parameter nu
+        lam0sq (float): square of the problem parameter lambda0
+
+    Returns:
+        types.SimpleNamespace: the kernels rhs, rhs_full, residual_full, residual_reaction and jacobian_diagonal
     """
 
-    def __init__(self, da, prob, factor, dx):
+    @jit(nopython=True, nogil=True)
+    def rhs(x, f_diff, f_reac, inv_dx2, xs, xe, gxs, mx):
+        """
+        Compiled kernel computing diffusion and reaction part of the RHS in a single pass over the values
+
+        Args:
+            x (numpy.ndarray): local values, including ghost points
+            f_diff (numpy.ndarray): locally owned part of the diffusion term (overwritten)
+            f_reac (numpy.ndarray): locally owned part of the reaction term (overwritten)
+            inv_dx2 (float): inverse of the squared grid spacing
+            xs (int): first locally owned grid point
+            xe (int): last locally owned grid point (exclusive)
+            gxs (int): first local grid point, including ghost points
+            mx (int): global number of grid points
+        """
+        for i in range(xs, xe):
+            k = i - gxs
+            if i == 0 or i == mx - 1:
+                f_diff[i - xs] = 0.0
+                f_reac[i - xs] = 0.0
+            else:
+                u = x[k]
+                f_diff[i - xs] = (x[k + 1] - 2.0 * u + x[k - 1]) * inv_dx2
+                f_reac[i - xs] = lam0sq * u * (1.0 - u**nu)
+
+    @jit(nopython=True, nogil=True)
+    def rhs_full(x, f, inv_dx2, xs, xe, gxs, mx):
+        """
+        Compiled kernel computing the sum of diffusion and reaction part of the RHS in a single pass over the values
+
+        Args:
+            x (numpy.ndarray): local values, including ghost points
+            f (numpy.ndarray): locally owned part of the RHS (overwritten)
+            inv_dx2 (float): inverse of the squared grid spacing
+            xs (int): first locally owned grid point
+            xe (int): last locally owned grid point (exclusive)
+            gxs (int): first local grid point, including ghost points
+            mx (int): global number of grid points
+        """
+        for i in range(xs, xe):
+            k = i - gxs
+            if i == 0 or i == mx - 1:
+                f[i - xs] = 0.0
+            else:
+                u = x[k]
+                f[i - xs] = (x[k + 1] - 2.0 * u + x[k - 1]) * inv_dx2 + lam0sq * u * (1.0 - u**nu)
+
+    @jit(nopython=True, nogil=True)
+    def residual_full(x, f, consts, xs, xe, gxs, mx):
+        """
+        Compiled kernel computing stencil and reaction term of the residual in a single pass
+
+        Args:
+            x (numpy.ndarray): local values, including ghost points
+            f (numpy.ndarray): locally owned part of the residual (overwritten)
+            consts (numpy.ndarray): temporal factor (dt*Qd) and inverse of the squared grid spacing
+            xs (int): first locally owned grid point
+            xe (int): last locally owned grid point (exclusive)
+            gxs (int): first local grid point, including ghost points
+            mx (int): global number of grid points
+        """
+        factor = consts[0]
+        inv_dx2 = consts[1]
+        for i in range(xs, xe):
+            k = i - gxs
+            if i == 0 or i == mx - 1:
+                f[i - xs] = x[k]
+            else:
+                u = x[k]
+                u_xx = (x[k + 1] - 2.0 * u + x[k - 1]) * inv_dx2
+                f[i - xs] = u - factor * (u_xx + lam0sq * u * (1.0 - u**nu))
+
+    @jit(nopython=True, nogil=True)
+    def residual_reaction(x, f, consts, xs, xe, gxs, mx):
+        """
+        Compiled kernel computing the residual of the reaction part
+
+        Args:
+            x (numpy.ndarray): local values, including ghost points
+            f (numpy.ndarray): locally owned part of the residual (overwritten)
+            consts (numpy.ndarray): temporal factor (dt*Qd)
+            xs (int): first locally owned grid point
+            xe (int): last locally owned grid point (exclusive)
+            gxs (int): first local grid point, including ghost points
+            mx (int): global number of grid points
+        """
+        factor = consts[0]
+        for i in range(xs, xe):
+            u = x[i - gxs]
+            if i == 0 or i == mx - 1:
+                f[i - xs] = u
+            else:
+                f[i - xs] = u - factor * lam0sq * u * (1.0 - u**nu)
+
+    @jit(nopython=True, nogil=True)
+    def jacobian_diagonal(x, diag, diag_lin, coeff, xs, xe, gxs, mx):
+        """
+        Compiled kernel computing the diagonal of the Jacobian, which is diag_lin + coeff * u**nu in the interior
+
+        Args:
+            x (numpy.ndarray): local values, including ghost points
+            diag (numpy.ndarray): locally owned part of the diagonal (overwritten)
+            diag_lin (float): part of the diagonal independent of u
+            coeff (float): coefficient of u**nu
+            xs (int): first locally owned grid point
+            xe (int): last locally owned grid point (exclusive)
+            gxs (int): first local grid point, including ghost points
+            mx (int): global number of grid points
+        """
+        for i in range(xs, xe):
+            if i == 0 or i == mx - 1:
+                diag[i - xs] = 1.0
+            else:
+                diag[i - xs] = diag_lin + coeff * x[i - gxs] ** nu
+
+    return SimpleNamespace(
+        rhs=rhs,
+        rhs_full=rhs_full,
+        residual_full=residual_full,
+        residual_reaction=residual_reaction,
+        jacobian_diagonal=jacobian_diagonal,
+    )
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _fill_csr_values(indptr, data, offdiag, diag):
+    """
+    Compiled kernel writing the CSR values of a three-point stencil with constant coefficients row by row
+
+    Args:
+        indptr (numpy.ndarray): row pointers of the sparsity pattern
+        data (numpy.ndarray): values matching the sparsity pattern (overwritten)
+        offdiag (float): coefficient of the east and west neighbors
+        diag (float): coefficient of the center point
+    """
+    for r in range(len(indptr) - 1):
+        p = indptr[r]
+        if indptr[r + 1] - p == 1:
+            # Dirichlet boundary row
+            data[p] = 1.0
+        else:
+            data[p] = offdiag
+            data[p + 1] = diag
+            data[p + 2] = offdiag
+
+
+class Fisher_base(object):
+    """
+    Base class for the helpers of PETSc's nonlinear solver SNES, holding the local ranges and the kernel constants
+    """
+
+    def __init__(self, da, prob, consts):
         """
         Initialization routine
 
         Args:
             da: DMDA object
             prob: problem instance
-            factor: temporal factor (dt*Qd)
-            dx: grid spacing in x direction
+            consts (list): constants passed to the kernels, starting with the temporal factor (dt*Qd)
         """
         assert da.getDim() == 1
         self.da = da
-        self.factor = factor
-        self.dx = dx
         self.prob = prob
         self.localX = da.createLocalVec()
         self.xs, self.xe = self.da.getRanges()[0]
+        self.gxs = self.da.getGhostRanges()[0][0]
         self.mx = self.da.getSizes()[0]
-        self.row = PETSc.Mat.Stencil()
-        self.col = PETSc.Mat.Stencil()
+        self.diag = np.empty(self.xe - self.xs)
+
+        # constants passed to the kernels in a single array, the factor in the first entry may change between calls
+        self.consts = np.array(consts, dtype=float)
+        self.lam0sq = self.prob.lam0sq
+        self.nu = self.prob.nu_exp
+
+    @property
+    def factor(self):
+        """
+        Temporal factor (dt*Qd), stored in the array of constants passed to the kernels
+        """
+        return self.consts[0]
+
+    @factor.setter
+    def factor(self, factor):
+        self.consts[0] = factor
+
+
+class Fisher_full(Fisher_base):
+    """
+    Helper class to generate residual and Jacobian matrix for PETSc's nonlinear solver SNES
+    """
+
+    def __init__(self, da, prob, factor, dx):
+        """
+        Initialization routine
+
+        Args:
+            da: DMDA object
+            prob: problem instance
+            factor: temporal factor (dt*Qd)
+            dx: grid spacing in x direction
+        """
+        super().__init__(da, prob, [factor, 1.0 / dx**2])
+        self.dx = dx
+        self.data = np.empty(len(self.prob.csr_indices))
+
+        # factor for which the off-diagonal entries in data and the coefficients of the diagonal were computed
+        self.data_factor = None
+        self.diag_lin = None
+        self.coeff = None
 
     def formFunction(self, snes, X, F):
         """
@@ -46,18 +258,8 @@ class Fisher_full(object):
             None (overwrites F)
         """
         self.da.globalToLocal(X, self.localX)
-        x = self.da.getVecArray(self.localX)
-        f = self.da.getVecArray(F)
-
-        for i in range(self.xs, self.xe):
-            if i == 0 or i == self.mx - 1:
-                f[i] = x[i]
-            else:
-                u = x[i]  # center
-                u_e = x[i + 1]  # east
-                u_w = x[i - 1]  # west
-                u_xx = (u_e - 2 * u + u_w) / self.dx**2
-                f[i] = x[i] - self.factor * (u_xx + self.prob.lambda0**2 * x[i] * (1 - x[i] ** self.prob.nu))
+        with self.prob.get_arrays(read=(self.localX,), write=(F,)) as (x, f):
+            self.prob.kernels.residual_full(x, f, self.consts, self.xs, self.xe, self.gxs, self.mx)
 
     def formJacobian(self, snes, X, J, P):
         """
@@ -72,34 +274,31 @@ class Fisher_full(object):
         Returns:
             matrix status
         """
+        # everything but the diagonal only depends on the factor, so it is only recomputed when the factor changes
+        if self.factor != self.data_factor:
+            factor, inv_dx2 = self.consts
+            self.data[:] = -factor * inv_dx2
+            self.diag_lin = 1.0 - factor * (-2.0 * inv_dx2 + self.lam0sq)
+            self.coeff = factor * self.lam0sq * (self.nu + 1)
+            self.data_factor = factor
+
         self.da.globalToLocal(X, self.localX)
-        x = self.da.getVecArray(self.localX)
-        P.zeroEntries()
+        with self.prob.get_arrays(read=(self.localX,)) as (x,):
+            self.prob.kernels.jacobian_diagonal(
+                x, self.diag, self.diag_lin, self.coeff, self.xs, self.xe, self.gxs, self.mx
+            )
+        self.data[self.prob.csr_diag] = self.diag
 
-        for i in range(self.xs, self.xe):
-            self.row.i = i
-            self.row.field = 0
-            if i == 0 or i == self.mx - 1:
-                P.setValueStencil(self.row, self.row, 1.0)
-            else:
-                diag = 1.0 - self.factor * (
-                    -2.0 / self.dx**2 + self.prob.lambda0**2 * (1.0 - (self.prob.nu + 1) * x[i] ** self.prob.nu)
-                )
-                for index, value in [
-                    (i - 1, -self.factor / self.dx**2),
-                    (i, diag),
-                    (i + 1, -self.factor / self.dx**2),
-                ]:
-                    self.col.i = index
-                    self.col.field = 0
-                    P.setValueStencil(self.row, self.col, value)
+        # insert all locally owned rows at once
+        P.zeroEntries()
+        P.setValuesIJV(self.prob.csr_indptr, self.prob.csr_indices, self.data)
         P.assemble()
         if J != P:
             J.assemble()  # matrix-free operator
         return PETSc.Mat.Structure.SAME_NONZERO_PATTERN
 
 
-class Fisher_reaction(object):
+class Fisher_reaction(Fisher_base):
     """
     Helper class to generate residual and Jacobian matrix for PETSc's nonlinear solver SNES
     """
@@ -112,13 +311,10 @@ class Fisher_reaction(object):
             da: DMDA object
             prob: problem instance
             factor: temporal factor (dt*Qd)
-            dx: grid spacing in x direction
         """
-        assert da.getDim() == 1
-        self.da = da
-        self.prob = prob
-        self.factor = factor
-        self.localX = da.createLocalVec()
+        super().__init__(da, prob, [factor])
+        self.indptr = np.arange(self.xe - self.xs + 1, dtype=PETSc.IntType)
+        self.indices = np.arange(self.xs, self.xe, dtype=PETSc.IntType)
 
     def formFunction(self, snes, X, F):
         """
@@ -135,15 +331,8 @@ class Fisher_reaction(object):
             None (overwrites F)
         """
         self.da.globalToLocal(X, self.localX)
-        x = self.da.getVecArray(self.localX)
-        f = self.da.getVecArray(F)
-        mx = self.da.getSizes()[0]
-        (xs, xe) = self.da.getRanges()[0]
-        for i in range(xs, xe):
-            if i == 0 or i == mx - 1:
-                f[i] = x[i]
-            else:
-                f[i] = x[i] - self.factor * self.prob.lambda0**2 * x[i] * (1 - x[i] ** self.prob.nu)
+        with self.prob.get_arrays(read=(self.localX,), write=(F,)) as (x, f):
+            self.prob.kernels.residual_reaction(x, f, self.consts, self.xs, self.xe, self.gxs, self.mx)
 
     def formJacobian(self, snes, X, J, P):
         """
@@ -158,20 +347,15 @@ class Fisher_reaction(object):
         Returns:
             matrix status
         """
+        diag_lin = 1.0 - self.factor * self.lam0sq
+        coeff = self.factor * self.lam0sq * (self.nu + 1)
+
         self.da.globalToLocal(X, self.localX)
-        x = self.da.getVecArray(self.localX)
+        with self.prob.get_arrays(read=(self.localX,)) as (x,):
+            # the diagonal has the same structure as the one of the full problem, so the kernel is shared
+            self.prob.kernels.jacobian_diagonal(x, self.diag, diag_lin, coeff, self.xs, self.xe, self.gxs, self.mx)
         P.zeroEntries()
-        row = PETSc.Mat.Stencil()
-        mx = self.da.getSizes()[0]
-        (xs, xe) = self.da.getRanges()[0]
-        for i in range(xs, xe):
-            row.i = i
-            row.field = 0
-            if i == 0 or i == mx - 1:
-                P.setValueStencil(row, row, 1.0)
-            else:
-                diag = 1.0 - self.factor * self.prob.lambda0**2 * (1.0 - (self.prob.nu + 1) * x[i] ** self.prob.nu)
-                P.setValueStencil(row, row, diag)
+        P.setValuesIJV(self.indptr, self.indices, self.diag)
         P.assemble()
         if J != P:
             J.assemble()  # matrix-free operator
@@ -197,11 +381,29 @@ class petsc_fisher_multiimplicit(ptype):
         nlsol_tol=1e-10,
         lsol_maxiter=None,
         nlsol_maxiter=None,
+        use_fd_coloring=False,
+        lsol_type='lu',
+        lsol_reuse_pc=False,
     ):
         """
         Initialization routine
 
-        TODO : doku
+        Args:
+            nvars (int): number of grid points
+            lambda0 (float): problem parameter lambda0
+            nu (float): problem parameter nu
+            interval (tuple): left and right boundary of the domain
+            comm: MPI communicator
+            lsol_tol (float): tolerance of the linear solver
+            nlsol_tol (float): tolerance of the nonlinear solver
+            lsol_maxiter (int): maximum number of iterations of the linear solver
+            nlsol_maxiter (int): maximum number of iterations of the nonlinear solver
+            use_fd_coloring (bool): approximate the Jacobian of the fully-implicit problem by colored finite differences
+            lsol_type (str): 'lu' for a direct solver, 'cg' for CG with ILU. With 'lu', serial runs solve the linear
+                problems in banded storage and use LU within the nonlinear solver. PETSc's LU is sequential, so
+                parallel runs always use CG.
+            lsol_reuse_pc (bool): keep the preconditioner of the linear solver when the factor changes. This only
+                concerns solves with CG, i.e. lsol_type='cg' or parallel runs, where it may slow down convergence.
         """
         # create DMDA object which will be used for all grid operations
         da = PETSc.DMDA().create([nvars], dof=1, stencil_width=1, comm=comm)
@@ -218,38 +420,71 @@ class petsc_fisher_multiimplicit(ptype):
             'nlsol_tol',
             'lsol_maxiter',
             'nlsol_maxiter',
+            'use_fd_coloring',
+            'lsol_type',
+            'lsol_reuse_pc',
             localVars=locals(),
             readOnly=True,
         )
 
+        if self.lsol_type not in ['lu', 'cg']:
+            raise ProblemError(f'linear solver type "{self.lsol_type}" not known, use "lu" or "cg"')
+
         # compute dx and get local ranges
         self.dx = (self.interval[1] - self.interval[0]) / (self.nvars - 1)
         (self.xs, self.xe) = self.init.getRanges()[0]
+        self.gxs = self.init.getGhostRanges()[0][0]
+
+        # precompute constants used in every evaluation
+        self.inv_dx2 = 1.0 / self.dx**2
+        self.lam0sq = self.lambda0**2
+
+        # integer exponents are evaluated by repeated multiplication instead of the generic pow in the compiled
+        # kernels, which have the parameters built in as constants
+        self.nu_exp = int(self.nu) if float(self.nu).is_integer() else float(self.nu)
+        self.kernels = get_fisher_kernels(self.nu_exp, self.lam0sq)
+
+        # wave speed and decay of the traveling wave solution, see u_exact
+        self.lam1 = self.lambda0 / 2.0 * ((self.nu / 2.0 + 1) ** 0.5 + (self.nu / 2.0 + 1) ** (-0.5))
+        self.sig1 = self.lam1 - np.sqrt(self.lam1**2 - self.lam0sq)
+
+        # sparsity pattern of the three-point stencil, shared by all matrices assembled here
+        self.csr_indptr, self.csr_indices, self.csr_diag = self.__get_csr_pattern()
 
         # compute discretization matrix A and identity
         self.A = self.__get_A()
         self.localX = self.init.createLocalVec()
 
-        # setup linear solver
+        # setup linear solver, which is only used for CG, since the direct solver works on the banded storage
         self.ksp = PETSc.KSP()
         self.ksp.create(comm=self.comm)
         self.ksp.setType('cg')
         pc = self.ksp.getPC()
         pc.setType('ilu')
         self.ksp.setInitialGuessNonzero(True)
+        # the preconditioner is rebuilt whenever the factor changes, unless the user accepts using the one of an older
+        # factor, which only affects the convergence of CG (the banded direct solve does not use the KSP at all)
+        self.ksp.setReusePreconditioner(self.lsol_reuse_pc)
         self.ksp.setFromOptions()
         self.ksp.setTolerances(rtol=self.lsol_tol, atol=self.lsol_tol, max_it=self.lsol_maxiter)
         self.ksp_itercount = 0
         self.ksp_ncalls = 0
 
+        # the tridiagonal systems are solved directly in banded storage for serial runs with a direct solver, this
+        # bypasses the KSP and its iteration count
+        self.use_banded = self.lsol_type == 'lu' and self.comm.getSize() == 1
+
+        # system matrices for the most recently used factors, SDC keeps cycling through the same few entries of dt*QI
+        self.sys_mat_cache = OrderedDict()
+        self.sys_mat_cache_size = 4
+        self.ksp_factor = None
+
         # setup nonlinear solver
         self.snes = PETSc.SNES()
         self.snes.create(comm=self.comm)
         if self.nlsol_maxiter <= 1:
             self.snes.setType('ksponly')
-        self.snes.getKSP().setType('cg')
-        pc = self.snes.getKSP().getPC()
-        pc.setType('ilu')
+        self.__set_lsol_type(self.snes.getKSP())
         # self.snes.setType('ngmres')
         self.snes.setFromOptions()
         self.snes.setTolerances(
@@ -261,7 +496,26 @@ class petsc_fisher_multiimplicit(ptype):
         self.snes_itercount = 0
         self.snes_ncalls = 0
         self.F = self.init.createGlobalVec()
-        self.J = self.init.createMatrix()
+        # helper providing residual and Jacobian to SNES, created and assigned on first use
+        self.snes_target = None
+
+    def __set_lsol_type(self, ksp):
+        """
+        Helper function to configure the linear solver within the nonlinear solver according to lsol_type
+
+        The systems are tridiagonal, so a single LU factorization ('lu') is exact and cheaper than CG with ILU ('cg').
+        PETSc's own LU is sequential, so parallel runs always use CG, where e.g. the options -pc_type bjacobi
+        -sub_pc_type lu select a suitable parallel preconditioner.
+
+        Args:
+            ksp: PETSc linear solver object
+        """
+        if self.lsol_type == 'lu' and self.comm.getSize() == 1:
+            ksp.setType('preonly')
+            ksp.getPC().setType('lu')
+        else:
+            ksp.setType('cg')
+            ksp.getPC().setType('ilu')
 
     def __get_A(self):
         """
@@ -279,28 +533,76 @@ class petsc_fisher_multiimplicit(ptype):
 
         # fill matrix
         A.zeroEntries()
-        row = PETSc.Mat.Stencil()
-        col = PETSc.Mat.Stencil()
-        mx = self.init.getSizes()[0]
-        (xs, xe) = self.init.getRanges()[0]
-        for i in range(xs, xe):
-            row.i = i
-            row.field = 0
-            if i == 0 or i == mx - 1:
-                A.setValueStencil(row, row, 1.0)
-            else:
-                diag = -2.0 / self.dx**2
-                for index, value in [
-                    (i - 1, 1.0 / self.dx**2),
-                    (i, diag),
-                    (i + 1, 1.0 / self.dx**2),
-                ]:
-                    col.i = index
-                    col.field = 0
-                    A.setValueStencil(row, col, value)
+        A.setValuesIJV(self.csr_indptr, self.csr_indices, self.__get_csr_values(self.inv_dx2, -2.0 * self.inv_dx2))
         A.assemble()
+        self.__set_pattern_options(A)
         return A
 
+    def get_jac_mat(self):
+        """
+        Helper function to create the matrix the SNES helpers assemble their Jacobians into
+
+        Returns:
+            PETSc matrix object
+        """
+        J = self.init.createMatrix()
+        self.__set_pattern_options(J)
+        return J
+
+    @staticmethod
+    def __set_pattern_options(A):
+        """
+        Helper function to fix the sparsity pattern of a matrix, which is the same for all matrices used here
+
+        Refilling the matrix then neither reallocates nor sorts its indices, and a stray entry outside the pattern is
+        an error instead of a silent reallocation.
+
+        Args:
+            A: PETSc matrix object
+        """
+        A.setOption(PETSc.Mat.Option.NEW_NONZERO_LOCATION_ERR, True)
+        A.setOption(PETSc.Mat.Option.KEEP_NONZERO_PATTERN, True)
+
+    def __get_csr_pattern(self):
+        """
+        Helper function to compute the CSR sparsity pattern of the locally owned rows of the three-point stencil
+
+        Returns:
+            numpy.ndarray: row pointers
+            numpy.ndarray: global column indices
+            numpy.ndarray: positions of the diagonal entries
+        """
+        mx = self.init.getSizes()[0]
+        rows = np.arange(self.xs, self.xe, dtype=PETSc.IntType)
+        boundary = (rows == 0) | (rows == mx - 1)
+
+        # boundary rows only have the diagonal entry, all others have three
+        indptr = np.zeros(len(rows) + 1, dtype=PETSc.IntType)
+        indptr[1:] = np.cumsum(np.where(boundary, 1, 3))
+        diag = np.where(boundary, indptr[:-1], indptr[:-1] + 1)
+
+        indices = np.empty(indptr[-1], dtype=PETSc.IntType)
+        indices[diag] = rows
+        indices[diag[~boundary] - 1] = rows[~boundary] - 1
+        indices[diag[~boundary] + 1] = rows[~boundary] + 1
+
+        return indptr, indices, diag
+
+    def __get_csr_values(self, offdiag, diag):
+        """
+        Helper function to compute the CSR values of a three-point stencil with constant coefficients
+
+        Args:
+            offdiag (float): coefficient of the east and west neighbors
+            diag (float): coefficient of the center point
+
+        Returns:
+            numpy.ndarray: values matching the sparsity pattern from __get_csr_pattern
+        """
+        data = np.empty(len(self.csr_indices))
+        _fill_csr_values(self.csr_indptr, data, offdiag, diag)
+        return data
+
     def get_sys_mat(self, factor):
         """
         Helper function to assemble the system matrix of the linear problem
@@ -318,28 +620,88 @@ class petsc_fisher_multiimplicit(ptype):
 
         # fill matrix
         A.zeroEntries()
-        row = PETSc.Mat.Stencil()
-        col = PETSc.Mat.Stencil()
-        mx = self.init.getSizes()[0]
-        (xs, xe) = self.init.getRanges()[0]
-        for i in range(xs, xe):
-            row.i = i
-            row.field = 0
-            if i == 0 or i == mx - 1:
-                A.setValueStencil(row, row, 1.0)
-            else:
-                diag = 1.0 + factor * 2.0 / self.dx**2
-                for index, value in [
-                    (i - 1, -factor / self.dx**2),
-                    (i, diag),
-                    (i + 1, -factor / self.dx**2),
-                ]:
-                    col.i = index
-                    col.field = 0
-                    A.setValueStencil(row, col, value)
+        A.setValuesIJV(
+            self.csr_indptr,
+            self.csr_indices,
+            self.__get_csr_values(-factor * self.inv_dx2, 1.0 + factor * 2.0 * self.inv_dx2),
+        )
         A.assemble()
+        self.__set_pattern_options(A)
+        return A
+
+    def get_sys_mat_banded(self, factor):
+        """
+        Helper function to assemble the system matrix of the linear problem in the banded storage of solve_banded
+
+        Returns:
+            numpy.ndarray: upper, main and lower diagonal
+        """
+        ab = np.empty((3, self.nvars))
+        ab[0, 1:] = -factor * self.inv_dx2
+        ab[1, :] = 1.0 + factor * 2.0 * self.inv_dx2
+        ab[2, :-1] = -factor * self.inv_dx2
+
+        # Dirichlet boundary rows
+        ab[1, 0] = ab[1, -1] = 1.0
+        ab[0, 1] = ab[2, -2] = 0.0
+        return ab
+
+    def get_cached_sys_mat(self, factor):
+        """
+        Helper function to get the system matrix for the given factor, assembling it only if not cached yet
+
+        Matrices are kept for the last sys_mat_cache_size factors, the least recently used one is dropped first. The
+        banded storage is used for the direct solver, the PETSc matrix otherwise.
+
+        Args:
+            factor (float): abbrev. for the local stepsize (or any other factor required)
+
+        Returns:
+            numpy.ndarray or PETSc matrix object
+        """
+        A = self.sys_mat_cache.pop(factor, None)
+        if A is None:
+            A = self.get_sys_mat_banded(factor) if self.use_banded else self.get_sys_mat(factor)
+            if len(self.sys_mat_cache) >= self.sys_mat_cache_size:
+                self.sys_mat_cache.popitem(last=False)
+        self.sys_mat_cache[factor] = A
         return A
 
+    @staticmethod
+    @contextmanager
+    def get_arrays(read=(), write=()):
+        """
+        Context manager providing the local values of PETSc vectors as NumPy arrays, without the index translation
+        of the DMDA's getVecArray
+
+        For global vectors these are the locally owned values, for local vectors the ghost points are included. The
+        arrays are restored to PETSc when leaving the context, so they must not be used afterwards.
+
+        Args:
+            read (tuple): vectors which are only read
+            write (tuple): vectors which are written to
+
+        Yields:
+            list of numpy.ndarray: arrays of the vectors in read, followed by the ones in write
+        """
+        with ExitStack() as stack:
+            yield [stack.enter_context(vec.getBuffer(readonly=True)) for vec in read] + [
+                stack.enter_context(vec.getBuffer()) for vec in write
+            ]
+
+    def eval_f_fused(self, u, f_diff, f_reac):
+        """
+        Helper function to evaluate diffusion and reaction part of the RHS, reading the values of u only once
+
+        Args:
+            u (dtype_u): current values
+            f_diff: PETSc vector for the diffusion part (overwritten)
+            f_reac: PETSc vector for the reaction part (overwritten)
+        """
+        self.init.globalToLocal(u, self.localX)
+        with self.get_arrays(read=(self.localX,), write=(f_diff, f_reac)) as (xa, fa1, fa2):
+            self.kernels.rhs(xa, fa1, fa2, self.inv_dx2, self.xs, self.xe, self.gxs, self.nvars)
+
     def eval_f(self, u, t):
         """
         Routine to evaluate the RHS
@@ -353,17 +715,7 @@ class petsc_fisher_multiimplicit(ptype):
         """
 
         f = self.dtype_f(self.init)
-        self.A.mult(u, f.comp1)
-        fa1 = self.init.getVecArray(f.comp1)
-        fa1[0] = 0
-        fa1[-1] = 0
-
-        fa2 = self.init.getVecArray(f.comp2)
-        xa = self.init.getVecArray(u)
-        for i in range(self.xs, self.xe):
-            fa2[i] = self.lambda0**2 * xa[i] * (1 - xa[i] ** self.nu)
-        fa2[0] = 0
-        fa2[-1] = 0
+        self.eval_f_fused(u, f.comp1, f.comp2)
 
         return f
 
@@ -383,10 +735,19 @@ class petsc_fisher_multiimplicit(ptype):
 
         me = self.dtype_u(u0)
 
-        self.ksp.setOperators(self.get_sys_mat(factor))
-        self.ksp.solve(rhs, me)
+        if self.use_banded:
+            # the system is tridiagonal, so a direct solve is much cheaper than the Krylov solver
+            ab = self.get_cached_sys_mat(factor)
+            with self.get_arrays(read=(rhs,), write=(me,)) as (ra, ma):
+                ma[:] = solve_banded((1, 1), ab, ra, check_finite=False)
+        else:
+            # only replace the operator if the factor changed, so that the preconditioner can be reused
+            if factor != self.ksp_factor:
+                self.ksp.setOperators(self.get_cached_sys_mat(factor))
+                self.ksp_factor = factor
+            self.ksp.solve(rhs, me)
+            self.ksp_itercount += self.ksp.getIterationNumber()
 
-        self.ksp_itercount += self.ksp.getIterationNumber()
         self.ksp_ncalls += 1
 
         return me
@@ -406,13 +767,13 @@ class petsc_fisher_multiimplicit(ptype):
         """
 
         me = self.dtype_u(u0)
-        target = Fisher_reaction(self.init, self, factor)
 
-        # assign residual function and Jacobian
-        F = self.init.createGlobalVec()
-        self.snes.setFunction(target.formFunction, F)
-        J = self.init.createMatrix()
-        self.snes.setJacobian(target.formJacobian, J)
+        # assign residual function and Jacobian only once, afterwards just update the factor
+        if self.snes_target is None:
+            self.snes_target = Fisher_reaction(self.init, self, factor)
+            self.snes.setFunction(self.snes_target.formFunction, self.F)
+            self.snes.setJacobian(self.snes_target.formJacobian, self.get_jac_mat())
+        self.snes_target.factor = factor
 
         self.snes.solve(rhs, me)
 
@@ -432,16 +793,11 @@ class petsc_fisher_multiimplicit(ptype):
             dtype_u: exact solution
         """
 
-        lam1 = self.lambda0 / 2.0 * ((self.nu / 2.0 + 1) ** 0.5 + (self.nu / 2.0 + 1) ** (-0.5))
-        sig1 = lam1 - np.sqrt(lam1**2 - self.lambda0**2)
         me = self.dtype_u(self.init)
-        xa = self.init.getVecArray(me)
-        for i in range(self.xs, self.xe):
-            xa[i] = (
-                1
-                + (2 ** (self.nu / 2.0) - 1)
-                * np.exp(-self.nu / 2.0 * sig1 * (self.interval[0] + (i + 1) * self.dx + 2 * lam1 * t))
-            ) ** (-2.0 / self.nu)
+        x = self.interval[0] + (np.arange(self.xs, self.xe) + 1) * self.dx
+        arg = -self.nu / 2.0 * self.sig1 * (x + 2 * self.lam1 * t)
+        with self.get_arrays(write=(me,)) as (xa,):
+            xa[:] = (1 + (2 ** (self.nu / 2.0) - 1) * np.exp(arg)) ** (-2.0 / self.nu)
 
         return me
 
@@ -466,14 +822,9 @@ class petsc_fisher_fullyimplicit(petsc_fisher_multiimplicit):
         """
 
         f = self.dtype_f(self.init)
-        self.A.mult(u, f)
-
-        fa2 = self.init.getVecArray(f)
-        xa = self.init.getVecArray(u)
-        for i in range(self.xs, self.xe):
-            fa2[i] += self.lambda0**2 * xa[i] * (1 - xa[i] ** self.nu)
-        fa2[0] = 0
-        fa2[-1] = 0
+        self.init.globalToLocal(u, self.localX)
+        with self.get_arrays(read=(self.localX,), write=(f,)) as (xa, fa):
+            self.kernels.rhs_full(xa, fa, self.inv_dx2, self.xs, self.xe, self.gxs, self.nvars)
 
         return f
 
@@ -492,12 +843,21 @@ class petsc_fisher_fullyimplicit(petsc_fisher_multiimplicit):
         """
 
         me = self.dtype_u(u0)
-        target = Fisher_full(self.init, self, factor, self.dx)
 
-        # assign residual function and Jacobian
-
-        self.snes.setFunction(target.formFunction, self.F)
-        self.snes.setJacobian(target.formJacobian, self.J)
+        # assign residual function and Jacobian only once, afterwards just update the factor
+        if self.snes_target is None:
+            self.snes_target = Fisher_full(self.init, self, factor, self.dx)
+            # the coloring needs the DMDA, which has to be set first, since SNES stores the callbacks with its DM
+            if self.use_fd_coloring:
+                self.snes.setDM(self.init)
+            self.snes.setFunction(self.snes_target.formFunction, self.F)
+            if self.use_fd_coloring:
+                # let PETSc approximate the Jacobian by finite differences, grouping the columns with the coloring of
+                # the DMDA's stencil, so only three residual evaluations are needed
+                self.snes.setUseFD(True)
+            else:
+                self.snes.setJacobian(self.snes_target.formJacobian, self.get_jac_mat())
+        self.snes_target.factor = factor
 
         self.snes.solve(rhs, me)
 
@@ -527,17 +887,7 @@ class petsc_fisher_semiimplicit(petsc_fisher_multiimplicit):
         """
 
         f = self.dtype_f(self.init)
-        self.A.mult(u, f.impl)
-        fa1 = self.init.getVecArray(f.impl)
-        fa1[0] = 0
-        fa1[-1] = 0
-
-        fa2 = self.init.getVecArray(f.expl)
-        xa = self.init.getVecArray(u)
-        for i in range(self.xs, self.xe):
-            fa2[i] = self.lambda0**2 * xa[i] * (1 - xa[i] ** self.nu)
-        fa2[0] = 0
-        fa2[-1] = 0
+        self.eval_f_fused(u, f.impl, f.expl)
 
         return f
 
@@ -555,12 +905,4 @@ class petsc_fisher_semiimplicit(petsc_fisher_multiimplicit):
             dtype_u: solution as mesh
         """
 
-        me = self.dtype_u(u0)
-
-        self.ksp.setOperators(self.get_sys_mat(factor))
-        self.ksp.solve(rhs, me)
-
-        self.ksp_itercount += self.ksp.getIterationNumber()
-        self.ksp_ncalls += 1
-
-        return me
+        return self.solve_system_1(rhs, factor, u0, t)
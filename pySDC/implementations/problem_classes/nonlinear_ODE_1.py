@@ -1,3 +1,5 @@
+import math
+
 import numpy as np
 
 from pySDC.core.Errors import ProblemError
@@ -67,29 +69,43 @@ class nonlinear_ODE_1(ptype):
         # create new mesh object from u0 and set initial values for iteration
         u = self.dtype_u(u0)
 
+        # the problem is scalar, so iterate on floats instead of paying the numpy overhead for every operation
+        uv = float(u[0])
+        rhsv = float(rhs[0])
+
         # start newton iteration
         n = 0
         res = 99
         while n < self.newton_maxiter:
+            # the square root is undefined for u > 1, treat this like the nan numpy would produce
+            if uv > 1:
+                res = math.nan
+                break
+
+            # the square root is needed for both g and dg, so compute it only once
+            s = math.sqrt(1 - uv)
+
             # form the function g with g(u) = 0
-            g = u - dt * np.sqrt(1 - u) - rhs
+            g = uv - dt * s - rhsv
 
             # if g is close to 0, then we are done
-            res = np.linalg.norm(g, np.inf)
-            if res < self.newton_tol or np.isnan(res):
+            res = abs(g)
+            if res < self.newton_tol or math.isnan(res):
                 break
 
-            # assemble dg/du
-            dg = 1 - (-dt) / (2 * np.sqrt(1 - u))
+            # assemble dg/du, which is infinite at the singularity u = 1
+            dg = 1 + dt / (2 * s) if s > 0 else math.inf
             # newton update: u1 = u0 - g/dg
-            u -= 1.0 / dg * g
+            uv -= g / dg
 
             # increase iteration count
             n += 1
 
-        if np.isnan(res) and self.stop_at_nan:
+        u[:] = uv
+
+        if math.isnan(res) and self.stop_at_nan:
             raise ProblemError('Newton got nan after %i iterations, aborting...' % n)
-        elif np.isnan(res):
+        elif math.isnan(res):
             self.logger.warning('Newton got nan after %i iterations...' % n)
 
         if n == self.newton_maxiter:
@@ -4,8 +4,7 @@
 """
 
 import importlib
-import inspect
-import os
+import pathlib
 
 from pySDC.helpers.problem_helper import get_finite_difference_stencil
 import pytest
@@ -21,18 +20,10 @@ def get_modules_in_path(base_package):
     Returns:
         list of str: list of `package.module` strings ready to be used by `import`
     """
-    assert os.path.isdir(base_package), "Base package not found: %s" % base_package
-    modules = []
+    base = pathlib.Path(base_package)
+    assert base.is_dir(), "Base package not found: %s" % base_package
 
-    for root, dirs, files in os.walk(base_package):
-        package = root.replace('/', '.')
-        for f in files:
-            if f.endswith('.py'):
-                if f == '__init__.py':
-                    continue
-                modules.append(package + '.' + f.replace('.py', ''))
-
-    return modules
+    return ['.'.join(f.with_suffix('').parts) for f in base.rglob('*.py') if f.name != '__init__.py']
 
 
 def load_modules_from_base(base_package):
@@ -55,12 +46,25 @@ def load_modules_from_base(base_package):
     return imported
 
 
+def get_all_subclasses(base_class):
+    """
+    Recursively collects all subclasses of given base class which have been defined so far
+    Args:
+        base_class (class):
+            base class as class object
+    Returns:
+        set of class objects: direct and indirect subclasses of `base_class`
+    """
+    subclasses = set(base_class.__subclasses__())
+    return subclasses.union(*[get_all_subclasses(cls) for cls in base_class.__subclasses__()])
+
+
 def get_derived_from_in_package(base_class, base_package):
     """
     Finds all derived classes of given base class in given package
     Uses :meth:`get_modules_in_path` to find all modules in given package and its subpackages,
-    then loads them with :meth:`load_modules_from_base` and tests all contained classes, whether
-    they are derived from `base_class`.
+    then loads them with :meth:`load_modules_from_base`, which registers all contained classes with their bases.
+    The subclasses of `base_class` are then filtered for those defined in the loaded modules.
     Args:
         base_class (class):
             base class as class object
@@ -68,23 +72,53 @@ def get_derived_from_in_package(base_class, base_package):
             as used by :meth:`get_modules_in_path`
     Returns:
         list of class objects:
-            all classes in `base_package` with `base_class` in their `__mro__`
+            all classes defined in the modules of `base_package` with `base_class` in their `__mro__`, sorted by module
+            and name. Classes defined in an `__init__.py` or only imported into the package are not included.
     """
     imported = load_modules_from_base(base_package)
-    derived = []
+    derived = [cls for cls in get_all_subclasses(base_class) if cls.__module__ in imported]
+
+    return sorted(derived, key=lambda cls: (cls.__module__, cls.__qualname__))
+
+
+# hardcoded stencils that were implemented in a previous version of the code, mapping (derivative, order, stencil_type)
+# to (stencil, prefactor, position of the zero offset)
+_FD_STENCILS = {
+    (1, 2, 'center'): ([-1.0, 0.0, 1.0], 1.0 / 2.0, 2),
+    (1, 4, 'center'): ([1.0, -8.0, 0.0, 8.0, -1.0], 1.0 / 12.0, 3),
+    (1, 6, 'center'): ([-1.0, 9.0, -45.0, 0.0, 45.0, -9.0, 1.0], 1.0 / 60.0, 4),
+    (1, 1, 'upwind'): ([-1.0, 1.0], 1.0, 2),
+    (1, 2, 'upwind'): ([1.0, -4.0, 3.0], 1.0 / 2.0, 3),
+    (1, 3, 'upwind'): ([1.0, -6.0, 3.0, 2.0], 1.0 / 6.0, 3),
+    (1, 4, 'upwind'): ([-5.0, 30.0, -90.0, 50.0, 15.0], 1.0 / 60.0, 4),
+    (1, 5, 'upwind'): ([3.0, -20.0, 60.0, -120.0, 65.0, 12.0], 1.0 / 60.0, 5),
+    (2, 2, 'center'): ([1, -2, 1], 1.0, 2),
+    (2, 4, 'center'): ([-1 / 12, 4 / 3, -5 / 2, 4 / 3, -1 / 12], 1.0, 3),
+    (2, 6, 'center'): ([1 / 90, -3 / 20, 3 / 2, -49 / 18, 3 / 2, -3 / 20, 1 / 90], 1.0, 4),
+    (2, 8, 'center'): ([-1 / 560, 8 / 315, -1 / 5, 8 / 5, -205 / 72, 8 / 5, -1 / 5, 8 / 315, -1 / 560], 1.0, 5),
+}
+
+
+def _get_reference_stencil(stencil, coeff, zero_pos):
+    """
+    Convert the reference values to a common way of writing with what we generate, sorted by the offsets
 
-    for module, loaded in imported.items():
-        print("checking module '%s': %s -> %s" % (module, loaded, loaded.__dict__.keys()))
-        for obj in dir(loaded):
-            cls = getattr(loaded, obj)
+    Args:
+        stencil (list): Coefficients of the stencil without prefactor
+        coeff (float): Prefactor of the stencil
+        zero_pos (int): Position of the zero offset (one-based)
 
-            if not inspect.isclass(cls):
-                continue
+    Returns:
+        numpy.ndarray: Coefficients
+        numpy.ndarray: Offsets
+    """
+    coeff_reference = np.array(stencil) * coeff
+    steps_reference = np.append(np.arange(-zero_pos + 1, 1), np.arange(1, zero_pos))[: len(coeff_reference)]
+    sorted_idx_reference = np.argsort(steps_reference)
+    return coeff_reference[sorted_idx_reference], steps_reference[sorted_idx_reference]
 
-            if base_class in cls.__mro__ and cls is not base_class:
-                derived.append(cls)
 
-    return derived
+FD_STENCIL_REFERENCE = {key: _get_reference_stencil(*value) for key, value in _FD_STENCILS.items()}
 
 
 def fd_stencil_single(derivative, order, stencil_type):
@@ -100,89 +134,21 @@ def fd_stencil_single(derivative, order, stencil_type):
     Returns:
         None
     """
-    if derivative == 1:
-        if stencil_type == 'center':
-            if order == 2:
-                stencil = [-1.0, 0.0, 1.0]
-                zero_pos = 2
-                coeff = 1.0 / 2.0
-            elif order == 4:
-                stencil = [1.0, -8.0, 0.0, 8.0, -1.0]
-                zero_pos = 3
-                coeff = 1.0 / 12.0
-            elif order == 6:
-                stencil = [-1.0, 9.0, -45.0, 0.0, 45.0, -9.0, 1.0]
-                zero_pos = 4
-                coeff = 1.0 / 60.0
-            else:
-                raise NotImplementedError("Order " + str(order) + " not implemented.")
-        elif stencil_type == 'upwind':
-            if order == 1:
-                stencil = [-1.0, 1.0]
-                coeff = 1.0
-                zero_pos = 2
-
-            elif order == 2:
-                stencil = [1.0, -4.0, 3.0]
-                coeff = 1.0 / 2.0
-                zero_pos = 3
-
-            elif order == 3:
-                stencil = [1.0, -6.0, 3.0, 2.0]
-                coeff = 1.0 / 6.0
-                zero_pos = 3
-
-            elif order == 4:
-                stencil = [-5.0, 30.0, -90.0, 50.0, 15.0]
-                coeff = 1.0 / 60.0
-                zero_pos = 4
-
-            elif order == 5:
-                stencil = [3.0, -20.0, 60.0, -120.0, 65.0, 12.0]
-                coeff = 1.0 / 60.0
-                zero_pos = 5
-            else:
-                raise NotImplementedError("Order " + str(order) + " not implemented.")
-        else:
-            raise NotImplementedError(
-                f"No reference values for stencil_type \"{stencil_type}\" implemented for 1st derivative"
-            )
-    elif derivative == 2:
-        if stencil_type == 'center':
-            coeff = 1.0
-            if order == 2:
-                stencil = [1, -2, 1]
-                zero_pos = 2
-            elif order == 4:
-                stencil = [-1 / 12, 4 / 3, -5 / 2, 4 / 3, -1 / 12]
-                zero_pos = 3
-            elif order == 6:
-                stencil = [1 / 90, -3 / 20, 3 / 2, -49 / 18, 3 / 2, -3 / 20, 1 / 90]
-                zero_pos = 4
-            elif order == 8:
-                stencil = [-1 / 560, 8 / 315, -1 / 5, 8 / 5, -205 / 72, 8 / 5, -1 / 5, 8 / 315, -1 / 560]
-                zero_pos = 5
-        else:
-            raise NotImplementedError(
-                f"No reference values for stencil_type \"{stencil_type}\" implemented for 2nd derivative"
-            )
-    else:
-        raise NotImplementedError(f"No reference values for derivative {derivative} implemented")
-
-    # convert the reference values to a common way of writing with what we generate here
-    coeff_reference = np.array(stencil) * coeff
-    steps_reference = np.append(np.arange(-zero_pos + 1, 1), np.arange(1, zero_pos))[: len(coeff_reference)]
-    sorted_idx_reference = np.argsort(steps_reference)
+    if (derivative, order, stencil_type) not in FD_STENCIL_REFERENCE:
+        raise NotImplementedError(
+            f"No reference values for derivative {derivative} with order {order} and stencil_type \"{stencil_type}\" implemented"
+        )
+    coeff_reference, steps_reference = FD_STENCIL_REFERENCE[(derivative, order, stencil_type)]
 
     coeff, steps = get_finite_difference_stencil(derivative=derivative, order=order, stencil_type=stencil_type)
     sorted_idx = np.argsort(steps)
     assert np.allclose(
-        coeff_reference[sorted_idx_reference], coeff[sorted_idx]
-    ), f"Got different FD coefficients for derivative {derivative} with order {order} and stencil_type {stencil_type}! Expected {coeff_reference[sorted_idx_reference]}, got {coeff[sorted_idx]}."
+        coeff_reference, coeff[sorted_idx]
+    ), f"Got different FD coefficients for derivative {derivative} with order {order} and stencil_type {stencil_type}! Expected {coeff_reference}, got {coeff[sorted_idx]}."
 
     assert np.allclose(
-        steps_reference[sorted_idx_reference], steps[sorted_idx]
-    ), f"Got different FD offsets for derivative {derivative} with order {order} and stencil_type {stencil_type}! Expected {steps_reference[sorted_idx_reference]}, got {steps[sorted_idx]}."
+        steps_reference, steps[sorted_idx]
+    ), f"Got different FD offsets for derivative {derivative} with order {order} and stencil_type {stencil_type}! Expected {steps_reference}, got {steps[sorted_idx]}."
 
 
 @pytest.mark.base
@@ -72,6 +72,46 @@ class TestBasics:
         assert np.linalg.norm(prob.u_exact(tEnd) - uNum, ord=np.inf) < testParams['tol']
 
 
+@pytest.mark.base
+def test_nonlinear_ODE_1_newton(caplog):
+    """
+    Test the scalar Newton solver of nonlinear_ODE_1, including the treatment of the singularity at u = 1 and of values
+    beyond it, where the square root is undefined.
+    """
+    from pySDC.core.Errors import ProblemError
+    from pySDC.implementations.problem_classes.nonlinear_ODE_1 import nonlinear_ODE_1
+
+    prob = nonlinear_ODE_1(u0=0.0, newton_maxiter=100, newton_tol=1e-12, stop_at_nan=True)
+    dt = 0.1
+
+    # u - dt * sqrt(1 - u) = rhs is a quadratic equation in s = sqrt(1 - u)
+    rhs = prob.dtype_u(prob.init, val=0.5)
+    s = (-dt + np.sqrt(dt**2 + 4 * (1 - 0.5))) / 2
+    u = prob.solve_system(rhs, dt, prob.dtype_u(prob.init, val=0.5), 0.0)
+    assert np.isclose(u[0], 1 - s**2, rtol=0, atol=1e-12), f'Newton converged to the wrong value {u[0]}'
+
+    # the derivative is infinite at u = 1, which is only a solution if g vanishes there
+    u = prob.solve_system(prob.dtype_u(prob.init, val=1.0), dt, prob.dtype_u(prob.init, val=1.0), 0.0)
+    assert u[0] == 1.0, f'Newton moved away from the solution u = 1 to {u[0]}'
+    with pytest.raises(ProblemError, match='did not converge'):
+        prob.solve_system(rhs, dt, prob.dtype_u(prob.init, val=1.0), 0.0)
+
+    # beyond u = 1 the residual is nan, which is either an error or a warning
+    with pytest.raises(ProblemError, match='nan'):
+        prob.solve_system(rhs, dt, prob.dtype_u(prob.init, val=1.5), 0.0)
+
+    prob = nonlinear_ODE_1(u0=0.0, newton_maxiter=100, newton_tol=1e-12, stop_at_nan=False)
+    with caplog.at_level('WARNING', logger='problem'):
+        u = prob.solve_system(rhs, dt, prob.dtype_u(prob.init, val=1.5), 0.0)
+    assert u[0] == 1.5, f'Newton should stop at the initial guess if it is beyond the singularity, got {u[0]}'
+    assert 'Newton got nan' in caplog.text, 'no warning about nan in Newton'
+
+    # too few iterations
+    prob = nonlinear_ODE_1(u0=0.0, newton_maxiter=1, newton_tol=1e-12, stop_at_nan=True)
+    with pytest.raises(ProblemError, match='did not converge'):
+        prob.solve_system(rhs, dt, prob.dtype_u(prob.init, val=0.0), 0.0)
+
+
 if __name__ == '__main__':
     test_scipy_reference([(2, 3)])
 
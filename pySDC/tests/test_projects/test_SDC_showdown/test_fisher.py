@@ -1,8 +1,307 @@
+import os
+import subprocess
+
+import numpy as np
 import pytest
 
 
+def get_problem_params():
+    problem_params = dict()
+    problem_params['nu'] = 1
+    problem_params['nvars'] = 129
+    problem_params['lambda0'] = 2.0
+    problem_params['interval'] = (-50, 50)
+    problem_params['nlsol_tol'] = 1e-10
+    problem_params['nlsol_maxiter'] = 100
+    problem_params['lsol_tol'] = 1e-10
+    problem_params['lsol_maxiter'] = 100
+    return problem_params
+
+
+def get_stencil_matrix(prob, offdiag, diag):
+    """
+    Assemble the matrix of a three-point stencil with Dirichlet boundary rows entry by entry, like the problem classes
+    originally did
+
+    Args:
+        prob: problem instance
+        offdiag (float): coefficient of the east and west neighbors
+        diag (numpy.ndarray): coefficients of the center points
+
+    Returns:
+        PETSc matrix object
+    """
+    from petsc4py import PETSc
+
+    A = prob.init.createMatrix()
+    A.setType('aij')
+    A.setFromOptions()
+    A.setPreallocationNNZ((3, 3))
+    A.setUp()
+    A.zeroEntries()
+    row = PETSc.Mat.Stencil()
+    col = PETSc.Mat.Stencil()
+    for i in range(prob.xs, prob.xe):
+        row.i = i
+        row.field = 0
+        if i == 0 or i == prob.nvars - 1:
+            A.setValueStencil(row, row, 1.0)
+        else:
+            for index, value in [(i - 1, offdiag), (i, diag[i]), (i + 1, offdiag)]:
+                col.i = index
+                col.field = 0
+                A.setValueStencil(row, col, value)
+    A.assemble()
+    return A
+
+
+def get_reference_rhs(prob, u):
+    """
+    Evaluate diffusion and reaction part of the RHS point by point, like the problem classes originally did
+
+    Args:
+        prob: problem instance
+        u: current values
+
+    Returns:
+        numpy.ndarray: diffusion part
+        numpy.ndarray: reaction part
+    """
+    x = u.getArray(readonly=True)
+    diff = np.zeros_like(x)
+    reac = np.zeros_like(x)
+    for i in range(1, prob.nvars - 1):
+        diff[i] = (x[i + 1] - 2 * x[i] + x[i - 1]) / prob.dx**2
+        reac[i] = prob.lambda0**2 * x[i] * (1 - x[i] ** prob.nu)
+    return diff, reac
+
+
+def mat_diff(A, B):
+    """
+    Compute the maximum norm of the difference of two matrices, overwriting the first one
+
+    Args:
+        A: PETSc matrix object (overwritten)
+        B: PETSc matrix object
+
+    Returns:
+        float: norm of A - B
+    """
+    from petsc4py import PETSc
+
+    A.axpy(-1.0, B)
+    return A.norm(PETSc.NormType.INFINITY)
+
+
 @pytest.mark.petsc
 def test_fisher():
     from pySDC.projects.SDC_showdown.SDC_timing_Fisher import main
 
     main()
+
+
+@pytest.mark.petsc
+def test_matrices():
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import petsc_fisher_multiimplicit
+
+    prob = petsc_fisher_multiimplicit(**get_problem_params())
+    inv_dx2 = 1.0 / prob.dx**2
+
+    ref = get_stencil_matrix(prob, inv_dx2, np.full(prob.nvars, -2.0 * inv_dx2))
+    err = mat_diff(ref, prob.A)
+    assert err < 1e-12, f'discretization matrix differs from the stencil by {err}'
+
+    for factor in [0.1, 0.05]:
+        ref = get_stencil_matrix(prob, -factor * inv_dx2, np.full(prob.nvars, 1.0 + 2.0 * factor * inv_dx2))
+        err = mat_diff(ref, prob.get_sys_mat(factor))
+        assert err < 1e-12, f'system matrix for factor {factor} differs from the stencil by {err}'
+
+
+@pytest.mark.petsc
+def test_banded_solve():
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import petsc_fisher_multiimplicit
+
+    prob = petsc_fisher_multiimplicit(lsol_type='lu', **get_problem_params())
+    inv_dx2 = 1.0 / prob.dx**2
+
+    rhs = prob.u_exact(0.0)
+    res = prob.dtype_u(prob.init)
+    for factor in [0.1, 0.05, 0.1]:
+        u = prob.solve_system_1(rhs, factor, rhs, 0.0)
+        ref = get_stencil_matrix(prob, -factor * inv_dx2, np.full(prob.nvars, 1.0 + 2.0 * factor * inv_dx2))
+        ref.mult(u, res)
+        res.axpy(-1.0, rhs)
+        assert abs(res) < 1e-10, f'banded solve does not solve the system for factor {factor}, residual is {abs(res)}'
+
+
+@pytest.mark.petsc
+@pytest.mark.parametrize('nu', [1, 2.5])
+def test_eval_f(nu):
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import (
+        petsc_fisher_multiimplicit,
+        petsc_fisher_fullyimplicit,
+        petsc_fisher_semiimplicit,
+    )
+
+    problem_params = get_problem_params()
+    problem_params['nu'] = nu
+
+    prob = petsc_fisher_multiimplicit(**problem_params)
+    u = prob.u_exact(0.5)
+    diff, reac = get_reference_rhs(prob, u)
+
+    f = prob.eval_f(u, 0.5)
+    assert np.allclose(f.comp1.getArray(readonly=True), diff)
+    assert np.allclose(f.comp2.getArray(readonly=True), reac)
+
+    f = petsc_fisher_semiimplicit(**problem_params).eval_f(u, 0.5)
+    assert np.allclose(f.impl.getArray(readonly=True), diff)
+    assert np.allclose(f.expl.getArray(readonly=True), reac)
+
+    f = petsc_fisher_fullyimplicit(**problem_params).eval_f(u, 0.5)
+    assert np.allclose(f.getArray(readonly=True), diff + reac)
+
+
+@pytest.mark.petsc
+@pytest.mark.parametrize('nu', [1, 2.5])
+def test_snes_helpers(nu):
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import (
+        Fisher_full,
+        Fisher_reaction,
+        petsc_fisher_fullyimplicit,
+    )
+
+    problem_params = get_problem_params()
+    problem_params['nu'] = nu
+
+    prob = petsc_fisher_fullyimplicit(**problem_params)
+    inv_dx2 = 1.0 / prob.dx**2
+    X = prob.u_exact(0.0)
+    x = X.getArray(readonly=True)
+    diff, reac = get_reference_rhs(prob, X)
+    dreac = prob.lambda0**2 * (1.0 - (nu + 1) * x**nu)
+
+    full = Fisher_full(prob.init, prob, 0.0, prob.dx)
+    reaction = Fisher_reaction(prob.init, prob, 0.0)
+    F = prob.init.createGlobalVec()
+    J = prob.get_jac_mat()
+
+    # change the factor in between to check that the helpers pick it up
+    for factor in [0.1, 0.05]:
+        full.factor = factor
+        reaction.factor = factor
+
+        full.formFunction(None, X, F)
+        assert np.allclose(F.getArray(readonly=True), x - factor * (diff + reac))
+        reaction.formFunction(None, X, F)
+        assert np.allclose(F.getArray(readonly=True), x - factor * reac)
+
+        full.formJacobian(None, X, J, J)
+        ref = get_stencil_matrix(prob, -factor * inv_dx2, 1.0 - factor * (-2.0 * inv_dx2 + dreac))
+        err = mat_diff(ref, J)
+        assert err < 1e-10, f'Jacobian of the full problem differs from the stencil by {err}'
+
+        reaction.formJacobian(None, X, J, J)
+        ref = get_stencil_matrix(prob, 0.0, 1.0 - factor * dreac)
+        err = mat_diff(ref, J)
+        assert err < 1e-10, f'Jacobian of the reaction part differs from the stencil by {err}'
+
+
+@pytest.mark.petsc
+def test_fd_coloring():
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import petsc_fisher_fullyimplicit
+
+    factors = [0.1, 0.05, 0.1]
+
+    solutions = []
+    itercounts = []
+    for use_fd_coloring in [False, True]:
+        prob = petsc_fisher_fullyimplicit(use_fd_coloring=use_fd_coloring, **get_problem_params())
+        u = prob.u_exact(0.0)
+        for factor in factors:
+            u = prob.solve_system(u, factor, u, 0.0)
+        solutions.append(u)
+        itercounts.append(prob.snes_itercount)
+
+    solutions[0].axpy(-1.0, solutions[1])
+    err = abs(solutions[0])
+    assert err < 1e-8, f'solutions with and without FD coloring differ by {err}'
+    assert abs(itercounts[0] - itercounts[1]) <= len(factors), f'SNES iteration counts differ too much: {itercounts}'
+
+
+@pytest.mark.petsc
+def test_lsol_type():
+    from pySDC.core.Errors import ProblemError
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import petsc_fisher_semiimplicit
+
+    factors = [0.1, 0.05, 0.1]
+
+    solutions = {}
+    for lsol_type in ['lu', 'cg']:
+        prob = petsc_fisher_semiimplicit(lsol_type=lsol_type, **get_problem_params())
+        u = prob.u_exact(0.0)
+        for factor in factors:
+            u = prob.solve_system(u, factor, u, 0.0)
+        solutions[lsol_type] = u
+
+        assert prob.ksp_ncalls == len(factors)
+        if prob.comm.getSize() == 1 and lsol_type == 'lu':
+            assert prob.ksp_itercount == 0, 'direct solver should not use the Krylov solver'
+        else:
+            assert prob.ksp_itercount > 0, 'iterations of the Krylov solver have not been counted'
+
+    solutions['lu'].axpy(-1.0, solutions['cg'])
+    err = abs(solutions['lu'])
+    assert err < 1e-8, f'solutions of direct and iterative linear solver differ by {err}'
+
+    with pytest.raises(ProblemError):
+        petsc_fisher_semiimplicit(lsol_type='gmres', **get_problem_params())
+
+
+@pytest.mark.petsc
+def test_reuse_pc():
+    from pySDC.implementations.problem_classes.GeneralizedFisher_1D_PETSc import petsc_fisher_semiimplicit
+
+    prob = petsc_fisher_semiimplicit(lsol_type='cg', lsol_reuse_pc=True, **get_problem_params())
+
+    # the preconditioner of the first factor is used for all others, which must not spoil the solution
+    rhs = prob.u_exact(0.0)
+    res = prob.dtype_u(prob.init)
+    for factor in [0.1, 0.05, 0.2, 0.1]:
+        u = prob.solve_system(rhs, factor, rhs, 0.0)
+        prob.get_sys_mat(factor).mult(u, res)
+        res.axpy(-1.0, rhs)
+        assert abs(res) < 1e-8, f'linear system not solved for factor {factor}, residual is {abs(res)}'
+
+
+@pytest.mark.petsc
+def test_reuse_pc_parallel():
+    # try to import MPI here, will fail if things go wrong (and not in the subprocess part)
+    try:
+        import mpi4py
+
+        del mpi4py
+    except ImportError:
+        raise ImportError('petsc tests need mpi4py')
+
+    # Set python path once
+    my_env = os.environ.copy()
+    my_env['PYTHONPATH'] = '../../..:.'
+    my_env['COVERAGE_PROCESS_START'] = 'pyproject.toml'
+    cwd = '.'
+    num_procs = 2
+    cmd = (
+        'mpirun -np ' + str(num_procs) + ' python pySDC/tests/test_projects/test_SDC_showdown/test_fisher.py'
+    ).split()
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=my_env, cwd=cwd)
+    p.wait()
+    for line in p.stdout:
+        print(line)
+    for line in p.stderr:
+        print(line)
+    assert p.returncode == 0, 'ERROR: did not get return code 0, got %s with %2i processes' % (p.returncode, num_procs)
+
+
+if __name__ == '__main__':
+    test_lsol_type()
+    test_reuse_pc()